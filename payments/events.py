@@ -1,85 +1,347 @@
 import pika
-import json
+import pika.exceptions
+import pika.spec
 import logging
+import orjson
+import queue
+import threading
+import time
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 
+ORDER_EVENTS_QUEUE = 'payment_service_order_events'
+
+
+class _ConnectionHolder(threading.local):
+    """
+    Thread-local cache of a RabbitMQ connection and channel, so blocking
+    publishers don't pay the TCP+AMQP handshake on every event.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.channel = None
+
+    def get_channel(self):
+        """Return a cached channel, opening a fresh connection if needed"""
+        if self.channel and self.channel.is_open:
+            return self.channel
+
+        self.reset()
+        connection = get_rabbitmq_connection()
+        if not connection:
+            return None
+
+        channel = connection.channel()
+        channel.confirm_delivery()
+
+        self.connection = connection
+        self.channel = channel
+        return channel
+
+    def reset(self):
+        """Drop cached handles after a connection/channel failure"""
+        if self.connection and not self.connection.is_closed:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.channel = None
+
+
+_connection_holder = _ConnectionHolder()
+
+
+def get_connection_parameters():
+    """Build RabbitMQ connection parameters from settings"""
+    credentials = pika.PlainCredentials(
+        settings.RABBITMQ_USER,
+        settings.RABBITMQ_PASSWORD
+    )
+    return pika.ConnectionParameters(
+        host=settings.RABBITMQ_HOST,
+        port=settings.RABBITMQ_PORT,
+        credentials=credentials,
+        heartbeat=600,
+        blocked_connection_timeout=300
+    )
+
+
 def get_rabbitmq_connection():
     """Create RabbitMQ connection"""
     try:
-        credentials = pika.PlainCredentials(
-            settings.RABBITMQ_USER,
-            settings.RABBITMQ_PASSWORD
-        )
-        parameters = pika.ConnectionParameters(
-            host=settings.RABBITMQ_HOST,
-            port=settings.RABBITMQ_PORT,
-            credentials=credentials,
-            heartbeat=600,
-            blocked_connection_timeout=300
-        )
-        return pika.BlockingConnection(parameters)
+        return pika.BlockingConnection(get_connection_parameters())
     except Exception as e:
         logger.error(f"Failed to connect to RabbitMQ: {str(e)}")
         return None
 
 
-def publish_payment_event(event_type, data):
+def declare_topology():
     """
-    Publish payment events to RabbitMQ
-    
-    Events:
-    - payment.succeeded
-    - payment.failed
-    - payment.refunded
+    Declare exchanges, queues and bindings once at startup so publishers
+    and consumers don't pay an extra AMQP round-trip per connection.
     """
-    connection = None
+    connection = get_rabbitmq_connection()
+    if not connection:
+        logger.warning("Skipping topology declaration - RabbitMQ unavailable")
+        return False
     try:
-        connection = get_rabbitmq_connection()
-        if not connection:
-            logger.error("Cannot publish event - RabbitMQ connection failed")
-            return False
-        
         channel = connection.channel()
-        
-        # Declare exchange
         channel.exchange_declare(
             exchange='payment_events',
             exchange_type='topic',
             durable=True
         )
-        
-        # Prepare message
-        message = {
-            'event_type': event_type,
-            'timestamp': str(data.get('timestamp', '')),
-            'data': data
-        }
-        
-        # Publish message
-        channel.basic_publish(
-            exchange='payment_events',
-            routing_key=event_type,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # Persistent message
-                content_type='application/json'
-            )
+        channel.exchange_declare(
+            exchange='order_events',
+            exchange_type='topic',
+            durable=True
         )
-        
-        logger.info(f"Published event: {event_type} for payment {data.get('payment_id')}")
+        channel.queue_declare(queue=ORDER_EVENTS_QUEUE, durable=True)
+        channel.queue_bind(
+            exchange='order_events',
+            queue=ORDER_EVENTS_QUEUE,
+            routing_key='order.cancelled'
+        )
+        logger.info("Declared RabbitMQ topology")
         return True
-        
     except Exception as e:
-        logger.error(f"Error publishing payment event: {str(e)}")
+        logger.error(f"Failed to declare RabbitMQ topology: {str(e)}")
         return False
     finally:
-        if connection and not connection.is_closed:
+        if not connection.is_closed:
             connection.close()
 
 
+class _AsyncPublisher(threading.Thread):
+    """
+    Background publisher thread running a pika SelectConnection IOLoop.
+
+    Request threads hand events off through a bounded in-process queue
+    (publish_payment_event) and never touch the broker socket. The IOLoop
+    drains the queue, publishes with delivery_mode=2 and tracks publisher
+    confirms; nacked or unconfirmed messages are re-enqueued when the
+    connection drops, and the thread reconnects with a fixed delay.
+    """
+
+    POLL_INTERVAL = 0.02
+    RECONNECT_DELAY = 2.0
+    # Messages published ahead of broker confirms; the broker acks them in
+    # batches (Basic.Ack with multiple=True) instead of per-message
+    MAX_IN_FLIGHT = 1000
+
+    def __init__(self, event_queue):
+        super().__init__(name='payment-event-publisher', daemon=True)
+        self._queue = event_queue
+        self._connection = None
+        self._channel = None
+        self._delivery_tag = 0
+        self._pending = {}  # delivery tag -> (routing_key, body)
+
+    def run(self):
+        while True:
+            # Re-assert topology on every (re)connect; this also covers a
+            # broker that was unavailable when app-ready first declared it
+            declare_topology()
+            try:
+                self._connection = pika.SelectConnection(
+                    get_connection_parameters(),
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_error,
+                    on_close_callback=self._on_connection_closed
+                )
+                self._connection.ioloop.start()
+            except Exception as e:
+                logger.error(f"Event publisher IOLoop crashed: {str(e)}")
+            self._requeue_pending()
+            time.sleep(self.RECONNECT_DELAY)
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error):
+        logger.error(f"Event publisher failed to connect: {str(error)}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        logger.warning(f"Event publisher connection closed: {str(reason)}")
+        self._channel = None
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        # Topology is declared by declare_topology() before each connect;
+        # the publisher just enables confirms and starts draining
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_delivery_confirmation)
+        self._channel = channel
+        self._delivery_tag = 0
+        self._schedule_drain()
+
+    def _on_channel_closed(self, channel, reason):
+        # A dead channel on a live connection would strand the drain loop
+        # forever; tear the connection down so run() requeues and reconnects
+        logger.warning(f"Event publisher channel closed: {str(reason)}")
+        self._channel = None
+        if self._connection and self._connection.is_open:
+            self._connection.close()
+
+    def _schedule_drain(self):
+        self._connection.ioloop.call_later(self.POLL_INTERVAL, self._drain_queue)
+
+    def _drain_queue(self):
+        if not self._channel or not self._channel.is_open:
+            return
+        # Pipeline publishes up to the confirm window; waiting for batched
+        # acks here applies backpressure instead of growing unbounded
+        while len(self._pending) < self.MAX_IN_FLIGHT:
+            try:
+                routing_key, body = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._publish(routing_key, body)
+        self._schedule_drain()
+
+    def _publish(self, routing_key, body):
+        self._delivery_tag += 1
+        self._pending[self._delivery_tag] = (routing_key, body)
+        self._channel.basic_publish(
+            exchange='payment_events',
+            routing_key=routing_key,
+            body=body,
+            properties=pika.BasicProperties(
+                delivery_mode=2,  # Persistent message
+                content_type='application/json'
+            )
+        )
+
+    def _on_delivery_confirmation(self, frame):
+        method = frame.method
+        nacked = isinstance(method, pika.spec.Basic.Nack)
+
+        if method.multiple:
+            # Delivery tags are monotonic and _pending is insertion-ordered,
+            # so a batched confirm releases entries from the front without
+            # scanning the whole window
+            while self._pending:
+                tag = next(iter(self._pending))
+                if tag > method.delivery_tag:
+                    break
+                self._release(tag, nacked)
+        else:
+            self._release(method.delivery_tag, nacked)
+
+    def _release(self, tag, nacked):
+        entry = self._pending.pop(tag, None)
+        if nacked and entry:
+            logger.warning(f"Broker nacked event {entry[0]}, re-enqueueing")
+            self._enqueue_again(entry)
+
+    def _requeue_pending(self):
+        """Put unconfirmed messages back on the queue after a disconnect"""
+        pending, self._pending = self._pending, {}
+        for entry in pending.values():
+            self._enqueue_again(entry)
+
+    def _enqueue_again(self, entry):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            logger.error(f"Publisher queue full, dropping event {entry[0]}")
+
+
+_PUBLISHER_QUEUE_MAXSIZE = 10000
+_publisher_queue = queue.Queue(maxsize=_PUBLISHER_QUEUE_MAXSIZE)
+_publisher_thread = None
+_publisher_lock = threading.Lock()
+
+
+def start_event_publisher():
+    """Start the background publisher thread (idempotent)"""
+    global _publisher_thread
+    with _publisher_lock:
+        if _publisher_thread is None or not _publisher_thread.is_alive():
+            _publisher_thread = _AsyncPublisher(_publisher_queue)
+            _publisher_thread.start()
+            logger.info("Started payment event publisher thread")
+
+
+def publish_payment_event(event_type, data):
+    """
+    Publish payment events to RabbitMQ
+    
+    Events:
+    - payment.succeeded
+    - payment.failed
+    - payment.refunded
+    """
+    # Prepare message
+    message = {
+        'event_type': event_type,
+        'timestamp': str(data.get('timestamp', '')),
+        'data': data
+    }
+    # orjson emits bytes directly - no str round-trip before the socket
+    body = orjson.dumps(message, default=str)
+
+    # Fast path: hand the event to the background publisher thread so the
+    # request thread never blocks on broker I/O.
+    if _publisher_thread is not None and _publisher_thread.is_alive():
+        try:
+            _publisher_queue.put_nowait((event_type, body))
+            return True
+        except queue.Full:
+            logger.error(f"Publisher queue full, dropping event {event_type}")
+            return False
+
+    return _publish_blocking(event_type, body, data)
+
+
+def _publish_blocking(event_type, body, data):
+    """
+    Synchronous publish fallback used when the background publisher thread
+    is not running (e.g. management commands), reusing the thread-local
+    cached connection.
+    """
+    # First attempt reuses the cached channel; on a stale connection the
+    # cached handles are dropped and one reconnect is attempted.
+    for attempt in range(2):
+        try:
+            channel = _connection_holder.get_channel()
+            if not channel:
+                logger.error("Cannot publish event - RabbitMQ connection failed")
+                return False
+
+            channel.basic_publish(
+                exchange='payment_events',
+                routing_key=event_type,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # Persistent message
+                    content_type='application/json'
+                )
+            )
+
+            logger.info(f"Published event: {event_type} for payment {data.get('payment_id')}")
+            return True
+
+        except (pika.exceptions.AMQPConnectionError,
+                pika.exceptions.ChannelClosed,
+                pika.exceptions.StreamLostError) as e:
+            _connection_holder.reset()
+            if attempt == 0:
+                logger.warning(f"RabbitMQ channel lost, reconnecting: {str(e)}")
+            else:
+                logger.error(f"Error publishing payment event: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error publishing payment event: {str(e)}")
+            return False
+
+    return False
+
+
 def consume_order_events():
     """
     Consume order cancellation events for automatic refunds
@@ -92,28 +354,14 @@ def consume_order_events():
             return
         
         channel = connection.channel()
-        
-        # Declare exchange
-        channel.exchange_declare(
-            exchange='order_events',
-            exchange_type='topic',
-            durable=True
-        )
-        
-        # Declare queue
-        queue_name = 'payment_service_order_events'
-        channel.queue_declare(queue=queue_name, durable=True)
-        
-        # Bind to order.cancelled events
-        channel.queue_bind(
-            exchange='order_events',
-            queue=queue_name,
-            routing_key='order.cancelled'
-        )
-        
+
+        # Topology (exchange, queue, binding) is declared once at startup
+        # by declare_topology(); the consumer just consumes
+        queue_name = ORDER_EVENTS_QUEUE
+
         def callback(ch, method, properties, body):
             try:
-                message = json.loads(body)
+                message = orjson.loads(body)
                 event_type = message.get('event_type')
                 data = message.get('data', {})
                 
@@ -126,7 +374,9 @@ def consume_order_events():
                 logger.error(f"Error processing order event: {str(e)}")
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
         
-        channel.basic_qos(prefetch_count=1)
+        # Keep a window of unacked messages in flight so the consumer isn't
+        # limited to one broker round-trip per message
+        channel.basic_qos(prefetch_count=settings.RABBITMQ_PREFETCH_COUNT)
         channel.basic_consume(queue=queue_name, on_message_callback=callback)
         
         logger.info("Started consuming order events...")
@@ -145,39 +395,44 @@ def handle_order_cancellation(data):
     """
     from .models import Payment
     from django.db import transaction
-    
+    from django.db.models import F
+
     order_id = data.get('order_id')
     if not order_id:
         logger.error("Order ID not found in cancellation event")
         return
-    
+
     try:
         with transaction.atomic():
-            # Find successful payments for this order
-            payments = Payment.objects.filter(
-                order_id=order_id,
-                status='SUCCESS'
+            # Snapshot the refundable payments under row locks so a
+            # concurrent view refund can't change the amounts between this
+            # read and the UPDATE, then settle them all with a single
+            # UPDATE instead of one save() per row
+            refundable = list(
+                Payment.objects.select_for_update().filter(
+                    order_id=order_id,
+                    status='SUCCESS',
+                    refunded_amount__lt=F('amount')
+                ).values('payment_id', 'order_id', 'amount', 'refunded_amount')
             )
-            
-            for payment in payments:
-                if payment.refunded_amount < payment.amount:
-                    # Calculate remaining refundable amount
-                    refund_amount = payment.amount - payment.refunded_amount
-                    
-                    # Process refund
-                    payment.refunded_amount += refund_amount
-                    payment.status = 'REFUNDED'
-                    payment.save()
-                    
-                    # Publish refund event
-                    publish_payment_event('payment.refunded', {
-                        'payment_id': payment.payment_id,
-                        'order_id': payment.order_id,
-                        'refund_amount': float(refund_amount),
-                        'reason': 'Order cancellation'
-                    })
-                    
-                    logger.info(f"Auto-refunded payment {payment.payment_id} due to order cancellation")
-                    
+
+            if not refundable:
+                return
+
+            Payment.objects.filter(
+                payment_id__in=[p['payment_id'] for p in refundable]
+            ).update(refunded_amount=F('amount'), status='REFUNDED')
+
+        # Publish after commit so consumers never see uncommitted refunds
+        for p in refundable:
+            refund_amount = p['amount'] - p['refunded_amount']
+            publish_payment_event('payment.refunded', {
+                'payment_id': p['payment_id'],
+                'order_id': p['order_id'],
+                'refund_amount': float(refund_amount),
+                'reason': 'Order cancellation'
+            })
+            logger.info(f"Auto-refunded payment {p['payment_id']} due to order cancellation")
+
     except Exception as e:
         logger.error(f"Error handling order cancellation: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete idempotency keys past their expires_at. '
+        'Intended to run hourly via cron so the table stays bounded '
+        'and key lookups remain cache-hot.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Rows deleted per batch to keep transactions short'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        while True:
+            expired = list(
+                IdempotencyKey.objects.filter(
+                    expires_at__lt=timezone.now()
+                ).values_list('pk', flat=True)[:batch_size]
+            )
+            if not expired:
+                break
+
+            # Nothing cascades onto IdempotencyKey, so _raw_delete skips
+            # the collector and issues a single DELETE per batch
+            batch = IdempotencyKey.objects.filter(pk__in=expired)
+            total += batch._raw_delete(batch.db)
+
+            if len(expired) < batch_size:
+                break
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Purged {total} expired idempotency keys')
+        )
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-09-01 11:39
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('payment_id', models.AutoField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(db_index=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('method', models.CharField(choices=[('CARD', 'Credit/Debit Card'), ('UPI', 'UPI'), ('COD', 'Cash on Delivery'), ('NET_BANKING', 'Net Banking')], max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SUCCESS', 'Success'), ('FAILED', 'Failed'), ('REFUNDED', 'Refunded'), ('PARTIAL_REFUND', 'Partially Refunded')], default='PENDING', max_length=20)),
+                ('reference', models.CharField(max_length=100, unique=True)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('gateway_response', models.JSONField(blank=True, null=True)),
+                ('failure_reason', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'payments',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['order_id', 'status'], name='payments_order_i_3d4604_idx'), models.Index(fields=['reference'], name='payments_referen_2b1f06_idx'), models.Index(fields=['created_at'], name='payments_created_e3a130_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False, unique=True)),
+                ('request_data', models.JSONField()),
+                ('response_data', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(default='PROCESSING', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='payments.payment')),
+            ],
+            options={
+                'db_table': 'idempotency_keys',
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_expires_6c9d28_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-09-01 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='payment',
+            options={'ordering': ['-payment_id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payments_order_i_3d4604_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payments_created_e3a130_idx',
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['order_id', 'status'], include=('refunded_amount', 'amount'), name='pay_cancel_covering_idx'),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-import uuid
+import secrets
 
 class Payment(models.Model):
     """Payment model for handling payment transactions"""
@@ -21,7 +21,7 @@ class Payment(models.Model):
         ('PARTIAL_REFUND', 'Partially Refunded'),
     ]
     
-    payment_id = models.AutoField(primary_key=True)
+    payment_id = models.BigAutoField(primary_key=True)
     order_id = models.IntegerField(db_index=True)
     amount = models.DecimalField(
         max_digits=10, 
@@ -45,11 +45,18 @@ class Payment(models.Model):
     
     class Meta:
         db_table = 'payments'
-        ordering = ['-created_at']
+        # payment_id is monotonically increasing, so PK ordering matches
+        # creation order while using the always-cached PK btree
+        ordering = ['-payment_id']
         indexes = [
-            models.Index(fields=['order_id', 'status']),
             models.Index(fields=['reference']),
-            models.Index(fields=['created_at']),
+            # Covers the order-cancellation refund scan so Postgres can
+            # answer it from the index alone
+            models.Index(
+                fields=['order_id', 'status'],
+                include=['refunded_amount', 'amount'],
+                name='pay_cancel_covering_idx'
+            ),
         ]
     
     def __str__(self):
@@ -57,10 +64,9 @@ class Payment(models.Model):
     
     def generate_reference(self):
         """Generate unique payment reference"""
-        from datetime import datetime
-        date_str = datetime.now().strftime('%Y%m%d')
-        unique_id = str(uuid.uuid4())[:6].upper()
-        return f"ECI{date_str}-{unique_id}"
+        # 48 bits of entropy - collisions are astronomically rare, so no
+        # retry handling is needed on the unique index
+        return f"ECI{secrets.token_hex(6).upper()}"
     
     def save(self, *args, **kwargs):
         if not self.reference:
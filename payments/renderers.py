@@ -0,0 +1,17 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer backed by orjson's native-code encoder"""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # default=str covers Decimal and other types orjson doesn't
+        # serialize natively
+        return orjson.dumps(data, default=str)
@@ -1,19 +1,56 @@
 from rest_framework import serializers
 from .models import Payment, IdempotencyKey
 from decimal import Decimal
+from operator import attrgetter
+import re
+
+# Compiled once; also used by views to pre-screen replayed keys without
+# paying for full serializer validation
+IDEMPOTENCY_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{10,255}$')
+
+# Field tuples captured once at import; attrgetter is C-implemented and
+# fetches every column in a single call on the hot serialization paths
+_PAYMENT_FIELDS = (
+    'payment_id', 'order_id', 'amount', 'method', 'status',
+    'reference', 'refunded_amount', 'created_at', 'updated_at',
+    'failure_reason'
+)
+_payment_getter = attrgetter(*_PAYMENT_FIELDS)
+
+_PAYMENT_LIST_FIELDS = (
+    'payment_id', 'order_id', 'amount', 'method',
+    'status', 'reference', 'created_at'
+)
+_payment_list_getter = attrgetter(*_PAYMENT_LIST_FIELDS)
+
 
 class PaymentSerializer(serializers.ModelSerializer):
     """Serializer for Payment model"""
-    
+
     class Meta:
         model = Payment
-        fields = [
-            'payment_id', 'order_id', 'amount', 'method', 'status',
-            'reference', 'refunded_amount', 'created_at', 'updated_at',
-            'failure_reason'
-        ]
+        fields = list(_PAYMENT_FIELDS)
         read_only_fields = ['payment_id', 'reference', 'created_at', 'updated_at', 'status']
 
+    def to_representation(self, instance):
+        # Build the dict directly instead of walking DRF's per-field
+        # reflection machinery for every instance
+        (payment_id, order_id, amount, method, payment_status, reference,
+         refunded_amount, created_at, updated_at, failure_reason) = \
+            _payment_getter(instance)
+        return {
+            'payment_id': payment_id,
+            'order_id': order_id,
+            'amount': str(amount),
+            'method': method,
+            'status': payment_status,
+            'reference': reference,
+            'refunded_amount': str(refunded_amount),
+            'created_at': created_at.isoformat() if created_at else None,
+            'updated_at': updated_at.isoformat() if updated_at else None,
+            'failure_reason': failure_reason,
+        }
+
 
 class ChargePaymentSerializer(serializers.Serializer):
     """Serializer for charging a payment"""
@@ -36,9 +73,10 @@ class ChargePaymentSerializer(serializers.Serializer):
     
     def validate_idempotency_key(self, value):
         """Validate idempotency key format"""
-        if not value or len(value) < 10:
+        if not IDEMPOTENCY_KEY_RE.match(value):
             raise serializers.ValidationError(
-                "Idempotency key must be at least 10 characters"
+                "Idempotency key must be 10-255 characters of letters, "
+                "digits, '-' or '_'"
             )
         return value
 
@@ -63,10 +101,20 @@ class RefundPaymentSerializer(serializers.Serializer):
 
 class PaymentListSerializer(serializers.ModelSerializer):
     """Serializer for listing payments"""
-    
+
     class Meta:
         model = Payment
-        fields = [
-            'payment_id', 'order_id', 'amount', 'method', 
-            'status', 'reference', 'created_at'
-        ]
\ No newline at end of file
+        fields = list(_PAYMENT_LIST_FIELDS)
+
+    def to_representation(self, instance):
+        (payment_id, order_id, amount, method, payment_status,
+         reference, created_at) = _payment_list_getter(instance)
+        return {
+            'payment_id': payment_id,
+            'order_id': order_id,
+            'amount': str(amount),
+            'method': method,
+            'status': payment_status,
+            'reference': reference,
+            'created_at': created_at.isoformat() if created_at else None,
+        }
\ No newline at end of file